@@ -21,7 +21,10 @@ programmatically specified via external dependency injection, such as with the
 `gin` library.
 """
 
-from typing import Dict, Sequence, Tuple, Text
+import contextlib
+import functools
+import sys
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Text, Union
 
 from ddsp import core
 import gin
@@ -47,8 +50,22 @@ class Processor(tfkl.Layer):
   output dictionary with all controls and signals.
   """
 
+  # Elementwise processors can run on the flat values of RaggedTensors.
+  supports_ragged = False
+  # Routing processors can compute their signal directly from their inputs
+  # with get_signal_from_args(), skipping the controls dictionary.
+  supports_direct = False
+  # Maximum number of input signatures to keep concrete functions for.
+  max_traces = 8
+
   def __init__(self, name: Text, trainable: bool = False):
     super().__init__(name=name, trainable=trainable, autocast=False)
+    # Concrete functions of get_controls() and get_signal(), created lazily and
+    # cached per input signature.
+    self._get_controls_cf = functools.lru_cache(maxsize=self.max_traces)(
+        self._trace_get_controls)
+    self._get_signal_cf = functools.lru_cache(maxsize=self.max_traces)(
+        self._trace_get_signal)
 
   def call(self, *args: tf.Tensor, **kwargs: tf.Tensor) -> tf.Tensor:
     """Convert input tensors arguments into a signal tensor."""
@@ -69,6 +86,44 @@ class Processor(tfkl.Layer):
     """Convert control tensors into a signal tensor."""
     raise NotImplementedError
 
+  def get_signal_from_args(self, *args: tf.Tensor) -> tf.Tensor:
+    """Convert input tensors directly into a signal tensor."""
+    raise NotImplementedError
+
+  def _trace_get_controls(self, input_signature: Sequence[tf.TensorSpec]):
+    """Trace get_controls() into a concrete function for an input signature."""
+    get_controls_fn = tf.function(self.get_controls, autograph=False)
+    return get_controls_fn.get_concrete_function(*input_signature)
+
+  def _trace_get_signal(self, keys: Sequence[Text],
+                        input_signature: Sequence[tf.TensorSpec]):
+    """Trace get_signal() into a concrete function taking positional controls.
+
+    Args:
+      keys: Names of the controls, in the order they are passed.
+      input_signature: TensorSpecs of the controls.
+
+    Returns:
+      A concrete function taking the controls as positional arguments.
+    """
+    def get_signal(*controls):
+      return self.get_signal(**dict(zip(keys, controls)))
+    get_signal_fn = tf.function(get_signal, autograph=False)
+    return get_signal_fn.get_concrete_function(*input_signature)
+
+  def _run_concrete(self, *args: tf.Tensor) -> Tuple[TensorDict, tf.Tensor]:
+    """Get controls and signal through the cached concrete functions."""
+    args = [tf.convert_to_tensor(x) for x in args]
+    input_signature = tuple(tf.TensorSpec.from_tensor(x) for x in args)
+    controls = self._get_controls_cf(input_signature)(*args)
+
+    # Pass controls positionally in sorted key order to avoid retracing.
+    keys = tuple(sorted(controls.keys()))
+    values = [controls[k] for k in keys]
+    input_signature = tuple(tf.TensorSpec.from_tensor(x) for x in values)
+    signal = self._get_signal_cf(keys, input_signature)(*values)
+    return controls, signal
+
 
 # ProcessorGroup Class ---------------------------------------------------------
 # Define Types.
@@ -80,7 +135,15 @@ DAG = Sequence[Node]
 class ProcessorGroup(tfkl.Layer):
   """String Proccesor() objects together into a processor_group."""
 
-  def __init__(self, dag: DAG, name: Text = 'processor_group'):
+  def __init__(self,
+               dag: DAG,
+               name: Text = 'processor_group',
+               emit_intermediates: bool = False,
+               jit_compile: bool = False,
+               device: Optional[Text] = None,
+               shape_profiles: Optional[Sequence[Dict[Text,
+                                                      tf.TensorSpec]]] = None,
+               max_traces: int = 8):
     """Constructor.
 
     Args:
@@ -92,19 +155,82 @@ class ProcessorGroup(tfkl.Layer):
         {"synth_additive": {"controls": {"f0_hz": value}}}.  The graph is read
         sequentially and must be topologically sorted. This means that all
         inputs for a processor must already be generated by earlier processors
-        (or inputs to the processor_group).
+        (or inputs to the processor_group). To sum more than two signals, prefer
+        a single AddN() node over a chain of Add() nodes.
       name: Name of processor_group.
+      emit_intermediates: Default for call(). If True, call() returns the
+        complete outputs dictionary like get_controls(), otherwise only the
+        output signal.
+      jit_compile: Compile the traced DAG with XLA, to fuse ops across
+        processors. Disabled by default, since not all processors may be
+        supported by XLA.
+      device: Device to run the DAG on, such as '/GPU:0'. Inputs are copied to
+        the device once, and all intermediate tensors stay on it. If None, ops
+        are placed by TensorFlow.
+      shape_profiles: Optional list of expected input signatures, each a
+        dictionary of TensorSpecs with the same keys as the inputs to the
+        processor_group. The DAG is traced for each of them in build(), so the
+        first batch of each shape does not pay for tracing. Dimensions can be
+        None, such as for any batch size. Inputs run through the first profile
+        they are compatible with.
+      max_traces: Maximum number of input signatures to trace the DAG for,
+        including shape profiles. Inputs with any further signature run the
+        DAG without tracing, so inputs of many lengths (such as inference on
+        variable length audio) don't retrace and keep a graph for each length.
     """
     super(ProcessorGroup, self).__init__(name=name)
     self.dag = dag
+    self.emit_intermediates = emit_intermediates
+    self.jit_compile = jit_compile
+    self.device = device
+    self.max_traces = max_traces
+    self._shape_profiles = list(shape_profiles or [])
+    # Input signatures of the shape profiles traced in build().
+    self._profile_signatures = []
     # Collect a list of processors.
     self.processors = [node[0] for node in self.dag]
+    # Intern the output dictionary keys, so dictionary lookups can compare
+    # strings by identity.
+    self._names = [sys.intern(p.name) for p in self.processors]
+    self._final_key = sys.intern(self.name)
+    # Resolve the string keys of the DAG into integer slots once, so running
+    # the DAG indexes a flat list instead of walking nested dictionaries.
+    self._input_keys = []
+    self._slot_of_key = {}
+    self._node_input_slots = []
+    self._node_output_slots = []
+    self._output_slot = None
+    self._layers = []
+    self._node_direct = []
+    self._compile_dag()
+    # Processors are built once, on the first run of the DAG.
+    self._dag_built = False
+    # Concrete functions of the traced DAG, one per input signature, for at
+    # most max_traces signatures.
+    self._traced_keys = set()
+    self._get_concrete_fn = functools.lru_cache(maxsize=None)(self._trace_dag)
+
+  def call(self,
+           dag_inputs: TensorDict,
+           return_all: Optional[bool] = None) -> Union[tf.Tensor, TensorDict]:
+    """Like Processor, but specific to having an input dictionary.
 
-  def call(self, dag_inputs: TensorDict) -> tf.Tensor:
-    """Like Processor, but specific to having an input dictionary."""
-    dag_outputs = self.get_controls(dag_inputs)
-    signal = self.get_signal(dag_outputs)
-    return signal
+    Args:
+      dag_inputs: A dictionary of input tensors fed to the signal processing
+        processor_group.
+      return_all: Return the complete outputs dictionary instead of only the
+        output signal. Defaults to self.emit_intermediates.
+
+    Returns:
+      The output signal tensor, or a nested dictionary of all the output
+      tensors if return_all.
+    """
+    if return_all is None:
+      return_all = self.emit_intermediates
+    if return_all:
+      return self.get_controls(dag_inputs)
+    # Fast path, the traced DAG only returns the output signal.
+    return self._run(dag_inputs, return_all=False)
 
   def get_controls(self, dag_inputs: TensorDict) -> TensorDict:
     """Run the DAG and get complete outputs dictionary for the processor_group.
@@ -116,39 +242,332 @@ class ProcessorGroup(tfkl.Layer):
     Returns:
       A nested dictionary of all the output tensors.
     """
-    # Also build layer on get_controls(), instead of just __call__().
-    self.built = True
+    dag_outputs = self._run(dag_inputs, return_all=True)
 
     # Initialize the outputs with inputs to the processor_group.
-    outputs = dag_inputs
+    outputs = dict(dag_inputs)
+    outputs.update(dag_outputs)
+    return outputs
+
+  def build(self, input_shape=None):
+    """Build processors and trace the DAG for each of the shape profiles."""
+    for profile in self._shape_profiles:
+      trie_cache = {}
+      input_signature = tuple(
+          self._profile_spec(
+              self._cached_nested_lookup(key, profile, trie_cache))
+          for key in self._input_keys)
+      if not self._dag_built:
+        self._ensure_built(input_signature)
+      self._get_traced_dag(input_signature, self.emit_intermediates)
+      if input_signature not in self._profile_signatures:
+        self._profile_signatures.append(input_signature)
+    super().build(input_shape)
+
+  def _profile_spec(self, spec: tf.TypeSpec) -> tf.TensorSpec:
+    """Returns the TensorSpec of an input in a shape profile, without name.
+
+    Args:
+      spec: TensorSpec from a shape profile.
 
-    # Run through the DAG nodes in sequential order.
-    for node in self.dag:
-      # Get the node processor and keys to the node input.
-      processor, keys = node
+    Returns:
+      TensorSpec with the same shape and dtype.
 
-      # Get the inputs to the node.
-      inputs = [core.nested_lookup(key, outputs) for key in keys]
+    Raises:
+      ValueError: If spec is not a TensorSpec.
+    """
+    if not isinstance(spec, tf.TensorSpec):
+      raise ValueError('Shape profiles must contain TensorSpecs, not {}. Use a '
+                       'RaggedProcessorGroup for RaggedTensorSpecs.'.format(
+                           spec))
+    return tf.TensorSpec(spec.shape, spec.dtype)
 
-      # Build the processor only if called the first time in a @tf.function.
-      # Need to explicitly build because we use get_controls() and get_signal()
-      # seperately, (to get intermediates) rather than directly using call().
-      if not processor.built:
-        processor.build([tensor.shape for tensor in inputs])
+  def _match_profile(
+      self, flat_inputs: Sequence[tf.Tensor],
+      input_signature: Sequence[tf.TypeSpec]) -> Sequence[tf.TypeSpec]:
+    """Returns the first traced shape profile compatible with the inputs.
 
-      # Run processor.
+    Args:
+      flat_inputs: Tensors for each of the DAG input keys.
+      input_signature: TypeSpecs of flat_inputs, returned if no profile is
+        compatible.
+
+    Returns:
+      Input signature to get the traced DAG for.
+    """
+    for profile_signature in self._profile_signatures:
+      if all(spec.is_compatible_with(x)
+             for spec, x in zip(profile_signature, flat_inputs)):
+        return profile_signature
+    return input_signature
+
+  def _run(self, dag_inputs: TensorDict,
+           return_all: bool) -> Union[tf.Tensor, TensorDict]:
+    """Run the traced DAG, only traced once per input signature."""
+    # Also build layer on get_controls(), instead of just __call__().
+    self.built = True
+
+    # Gather the inputs of the DAG into a flat list of tensors, resolving each
+    # shared prefix of the nested keys only once.
+    trie_cache = {}
+    flat_inputs = [
+        self._convert_input(
+            self._cached_nested_lookup(key, dag_inputs, trie_cache))
+        for key in self._input_keys
+    ]
+    input_signature = tuple(tf.type_spec_from_value(x) for x in flat_inputs)
+    input_signature = self._match_profile(flat_inputs, input_signature)
+
+    # Build processors once, before running the traced DAG.
+    if not self._dag_built:
+      self._ensure_built(input_signature)
+
+    concrete_fn = self._get_traced_dag(input_signature, return_all)
+    with self._device_scope():
+      if self.device is not None:
+        flat_inputs = [tf.identity(x) for x in flat_inputs]
+      if concrete_fn is None:
+        return self._run_dag(*flat_inputs, return_all=return_all)
+      return concrete_fn(*flat_inputs)
+
+  def _get_traced_dag(self, input_signature: Sequence[tf.TypeSpec],
+                      return_all: bool):
+    """Returns the traced DAG, or None if max_traces signatures are traced."""
+    key = (input_signature, return_all)
+    if key not in self._traced_keys:
+      if len(self._traced_keys) >= self.max_traces:
+        return None
+      self._traced_keys.add(key)
+    return self._get_concrete_fn(input_signature, return_all)
+
+  def _device_scope(self):
+    """Place ops on self.device, or leave the caller's device scope if None."""
+    if self.device is None:
+      return contextlib.nullcontext()
+    return tf.device(self.device)
+
+  def _convert_input(self, x) -> tf.Tensor:
+    """Convert an input of the processor_group to a tensor."""
+    return tf.convert_to_tensor(x)
+
+  def _compile_dag(self):
+    """Assign an integer slot to every unique key of the DAG.
+
+    Slots [0, len(self._input_keys)) hold the tensors read from the
+    processor_group inputs, the remaining slots hold tensors generated by
+    processors. For each node, stores the slots of its inputs, and the slots
+    it fills along with the key relative to the node outputs
+    (e.g. "controls/f0_hz").
+    """
+    processor_names = set()
+    produced_keys = []
+    for name, (_, keys) in zip(self._names, self.dag):
+      for key in keys:
+        if key.split('/')[0] in processor_names:
+          if key not in produced_keys:
+            produced_keys.append(key)
+        elif key not in self._input_keys:
+          self._input_keys.append(key)
+      processor_names.add(name)
+
+    # The signal of the last processor is always needed as the output.
+    output_key = self._names[-1] + '/signal'
+    if output_key not in produced_keys:
+      produced_keys.append(output_key)
+
+    for slot, key in enumerate(self._input_keys + produced_keys):
+      self._slot_of_key[key] = slot
+
+    self._output_slot = self._slot_of_key[output_key]
+    for name, (_, keys) in zip(self._names, self.dag):
+      self._node_input_slots.append([self._slot_of_key[key] for key in keys])
+      prefix = name + '/'
+      self._node_output_slots.append([
+          (self._slot_of_key[key], key[len(prefix):])
+          for key in produced_keys if key.startswith(prefix)
+      ])
+
+    # Nodes whose controls are not read by later nodes can skip get_controls()
+    # if the processor supports it.
+    for processor, output_slots in zip(self.processors,
+                                       self._node_output_slots):
+      self._node_direct.append(processor.supports_direct and
+                               all(key == 'signal' for _, key in output_slots))
+
+    # Group the nodes into layers, where each node only depends on nodes in
+    # earlier layers. Nodes within a layer are independent branches.
+    producer_of_slot = {}
+    for node_idx, output_slots in enumerate(self._node_output_slots):
+      for slot, _ in output_slots:
+        producer_of_slot[slot] = node_idx
+    depths = []
+    for input_slots in self._node_input_slots:
+      parent_depths = [depths[producer_of_slot[slot]] for slot in input_slots
+                       if slot in producer_of_slot]
+      depths.append(max(parent_depths, default=-1) + 1)
+    self._layers = [[i for i, d in enumerate(depths) if d == depth]
+                    for depth in range(max(depths) + 1)]
+
+  def _ensure_built(self, input_signature: Sequence[tf.TensorSpec]):
+    """Build all processors once, with a symbolic pass through the DAG.
+
+    The input shapes of each processor are inferred by tracing the DAG, so
+    processors are built ahead of the traced DAG function, which then contains
+    no build logic. Variables are created eagerly, in the current name scope
+    (e.g. "processor_group/").
+
+    Args:
+      input_signature: TensorSpecs of the inputs to the DAG.
+    """
+    name_scope = tf.get_current_name_scope()
+    name_scope = name_scope + '/' if name_scope else ''
+
+    def build_dag(*flat_inputs):
+      slots = self._init_slots(flat_inputs)
+      for node_idx, processor in enumerate(self.processors):
+        if not processor.built:
+          shapes = [slots[i].shape for i in self._node_input_slots[node_idx]]
+          with tf.init_scope(), tf.name_scope(name_scope):
+            processor.build(shapes)
+        self._run_node(node_idx, slots)
+      return []
+
+    build_fn = tf.function(build_dag, autograph=False)
+    build_fn.get_concrete_function(*input_signature)
+    self._dag_built = True
+
+  def _trace_dag(self, input_signature: Sequence[tf.TensorSpec],
+                 return_all: bool):
+    """Trace the DAG into a concrete function."""
+    def dag_fn(*flat_inputs):
+      return self._run_dag(*flat_inputs, return_all=return_all)
+    dag_fn = tf.function(dag_fn, autograph=False, jit_compile=self.jit_compile)
+    with self._device_scope():
+      return dag_fn.get_concrete_function(*input_signature)
+
+  def _init_slots(self, flat_inputs: Sequence[tf.Tensor]) -> List[tf.Tensor]:
+    """Returns the slots list, filled with the inputs of the DAG."""
+    n_slots = len(self._slot_of_key)
+    return list(flat_inputs) + [None] * (n_slots - len(flat_inputs))
+
+  def _run_node(self,
+                node_idx: int,
+                slots: List[tf.Tensor],
+                direct: bool = False) -> Tuple[TensorDict, tf.Tensor]:
+    """Run a processor on its input slots, and fill its output slots.
+
+    Args:
+      node_idx: Index of the node in the DAG.
+      slots: List of tensors for each slot, modified in place.
+      direct: Get the signal with get_signal_from_args(), skipping the
+        controls.
+
+    Returns:
+      controls: Dictionary of the processor controls, None if direct.
+      signal: Output signal of the processor.
+    """
+    processor = self.processors[node_idx]
+    inputs = [slots[i] for i in self._node_input_slots[node_idx]]
+    controls, signal = self._run_processor(processor, inputs, direct)
+    self._fill_node_slots(node_idx, slots, controls, signal)
+    return controls, signal
+
+  def _run_processor(self, processor: Processor, inputs: Sequence[tf.Tensor],
+                     direct: bool) -> Tuple[TensorDict, tf.Tensor]:
+    """Returns the controls and signal of a processor for the inputs."""
+    if direct:
+      return None, processor.get_signal_from_args(*inputs)
+    if tf.executing_eagerly():
+      # The DAG is not traced for these inputs, so don't trace the processor.
       controls = processor.get_controls(*inputs)
-      signal = processor.get_signal(**controls)
+      return controls, processor.get_signal(**controls)
+    return processor._run_concrete(*inputs)  # pylint: disable=protected-access
+
+  def _fill_node_slots(self, node_idx: int, slots: List[tf.Tensor],
+                       controls: TensorDict, signal: tf.Tensor):
+    """Fill the slots of a node outputs that are read by later nodes."""
+    trie_cache = {}
+    for slot, key in self._node_output_slots[node_idx]:
+      if key == 'signal':
+        slots[slot] = signal
+      else:
+        slots[slot] = self._cached_nested_lookup(key, {'controls': controls},
+                                                 trie_cache)
+
+  def _cached_nested_lookup(self, nested_key: Text,
+                            nested_dict: Dict[Text, Any],
+                            trie_cache: Dict[Text, Any]) -> Any:
+    """Like core.nested_lookup(), but caches the value of every prefix.
 
-      #  Add outputs to the dictionary.
-      outputs[processor.name] = {'controls': controls, 'signal': signal}
+    Args:
+      nested_key: String of the form "key/key/key...".
+      nested_dict: Nested dictionary.
+      trie_cache: Dictionary of values already looked up in nested_dict, keyed
+        by nested key. Updated with the value of nested_key and its prefixes.
+
+    Returns:
+      value: Value of the key from the nested dictionary.
+    """
+    if nested_key not in trie_cache:
+      prefix, _, key = nested_key.rpartition('/')
+      parent = (self._cached_nested_lookup(prefix, nested_dict, trie_cache)
+                if prefix else nested_dict)
+      trie_cache[nested_key] = parent[key]
+    return trie_cache[nested_key]
+
+  def _run_dag(self,
+               *flat_inputs: tf.Tensor,
+               return_all: bool = True) -> Union[tf.Tensor, TensorDict]:
+    """Run the DAG nodes, one layer of independent nodes at a time.
+
+    Nodes of a layer have no data dependencies on each other, so the
+    TensorFlow executor may run them in parallel. This only holds for
+    stateless processors: tf.function adds automatic control dependencies
+    between stateful ops, such as the random noise of FilteredNoise, so those
+    still run in the order of the DAG.
 
-    # Get output signal from last processor.
-    output_name = self.processors[-1].name
-    outputs[self.name] = {'signal': outputs[output_name]['signal']}
+    Args:
+      *flat_inputs: Tensors for each of the DAG input keys.
+      return_all: Return the outputs of all processors, instead of only the
+        output signal.
 
+    Returns:
+      A nested dictionary of the output tensors of all processors if
+      return_all, otherwise the output signal tensor.
+    """
+    slots = self._init_slots(flat_inputs)
+    outputs = {}
+    changed_dtype = False
+
+    for layer in self._layers:
+      for node_idx in layer:
+        changed_dtype = changed_dtype or self._changes_dtype(node_idx, slots)
+        direct = not return_all and self._node_direct[node_idx]
+        controls, signal = self._run_node(node_idx, slots, direct)
+        #  Add outputs to the dictionary.
+        if return_all:
+          outputs[self._names[node_idx]] = {'controls': controls,
+                                            'signal': signal}
+
+    # Get output signal from last processor, cast back to the dtype of the
+    # inputs if processors changed the precision of the signals.
+    signal = slots[self._output_slot]
+    input_dtypes = [x.dtype for x in flat_inputs if x.dtype.is_floating]
+    if changed_dtype and input_dtypes and signal.dtype != input_dtypes[0]:
+      signal = tf.cast(signal, input_dtypes[0])
+
+    if not return_all:
+      return signal
+
+    outputs[self._final_key] = {'signal': signal}
     return outputs
 
+  def _changes_dtype(self, node_idx: int, slots: List[tf.Tensor]) -> bool:
+    """Whether a processor computes its signal in another dtype than inputs."""
+    dtype = getattr(self.processors[node_idx], 'signal_dtype', None)
+    return dtype is not None and any(
+        slots[i].dtype != dtype for i in self._node_input_slots[node_idx])
+
   def get_signal(self, dag_outputs: TensorDict) -> tf.Tensor:
     """Extract the output signal from the dag outputs.
 
@@ -159,16 +578,125 @@ class ProcessorGroup(tfkl.Layer):
       Signal tensor.
     """
     # Initialize the outputs with inputs to the processor_group.
-    return dag_outputs[self.name]['signal']
+    return dag_outputs[self._final_key]['signal']
+
+
+@gin.configurable
+class RaggedProcessorGroup(ProcessorGroup):
+  """ProcessorGroup that carries variable length signals as RaggedTensors.
+
+  Processors that support ragged inputs (such as Add and Mix) run directly on
+  the flat values of RaggedTensors with identical row splits, so no compute is
+  spent on padding. If the row splits differ, such as for a control rate
+  mix_level, they run on padded inputs instead and return a RaggedTensor with
+  the row splits of their first input. All other processors get their ragged
+  inputs padded to dense tensors.
+  """
+
+  def _profile_spec(self, spec: tf.TypeSpec) -> tf.TypeSpec:
+    """Returns the spec of an input in a shape profile, keeping ragged specs."""
+    if isinstance(spec, tf.RaggedTensorSpec):
+      return spec
+    return super()._profile_spec(spec)
+
+  def _convert_input(self, x) -> Union[tf.Tensor, tf.RaggedTensor]:
+    """Convert an input of the processor_group, keeping RaggedTensors."""
+    if isinstance(x, tf.RaggedTensor):
+      return x
+    return tf.convert_to_tensor(x)
+
+  def _run_processor(self, processor: Processor, inputs: Sequence[tf.Tensor],
+                     direct: bool) -> Tuple[TensorDict, tf.Tensor]:
+    """Run a processor on the flat values of its inputs if possible."""
+    is_ragged = [isinstance(x, tf.RaggedTensor) for x in inputs]
+
+    if not any(is_ragged):
+      return super()._run_processor(processor, inputs, direct)
+
+    if processor.supports_ragged and all(is_ragged):
+      row_splits = inputs[0].row_splits
+      run_processor = super()._run_processor
+
+      def run_flat():
+        # Run on the flat values, as a batch of one contiguous signal.
+        flat_inputs = [x.flat_values[tf.newaxis] for x in inputs]
+        controls, signal = run_processor(processor, flat_inputs, direct)
+        return tf.nest.map_structure(lambda x: x[0], (controls or {}, signal))
+
+      def run_padded():
+        # Inputs with other row lengths are resampled per row when padded.
+        dense_inputs = [x.to_tensor() for x in inputs]
+        controls, signal = run_processor(processor, dense_inputs, direct)
+        to_flat = lambda x: tf.RaggedTensor.from_tensor(
+            x, lengths=inputs[0].row_lengths()).flat_values
+        return tf.nest.map_structure(to_flat, (controls or {}, signal))
+
+      if all(x.row_splits is row_splits for x in inputs):
+        controls, signal = run_flat()
+      else:
+        same_row_splits = tf.reduce_all(
+            [tf.reduce_all(tf.equal(x.row_splits, row_splits))
+             for x in inputs[1:]])
+        controls, signal = tf.cond(same_row_splits, run_flat, run_padded)
+
+      to_ragged = inputs[0].with_flat_values
+      controls = None if direct else tf.nest.map_structure(to_ragged, controls)
+      return controls, to_ragged(signal)
+
+    inputs = [x.to_tensor() if ragged else x
+              for x, ragged in zip(inputs, is_ragged)]
+    return super()._run_processor(processor, inputs, direct)
 
 
 # Routing processors for manipulating signals in a processor_group -------------
+class _PureProcessor(Processor):
+  """Base class for stateless routing processors without any variables.
+
+  Calling the processor dispatches straight to get_controls() and get_signal(),
+  skipping the per-call overhead of keras.Layer.__call__() (input checks, name
+  scopes and build tracking). Processors with variables should instead inherit
+  from Processor.
+  """
+
+  def __call__(self, *args: tf.Tensor, **kwargs: tf.Tensor) -> tf.Tensor:
+    # Don't use `training` or `mask` arguments from keras.Layer.
+    for k in ['training', 'mask']:
+      if k in kwargs:
+        _ = kwargs.pop(k)
+
+    # Convert inputs like keras.Layer does, keeping RaggedTensors.
+    def to_tensor(x):
+      return x if isinstance(x, tf.RaggedTensor) else tf.convert_to_tensor(x)
+    args = [to_tensor(x) for x in args]
+    kwargs = {k: to_tensor(v) for k, v in kwargs.items()}
+    return self.get_signal(**self.get_controls(*args, **kwargs))
+
+
+def _cast_signals(signals: Sequence[tf.Tensor],
+                  dtype: Optional[tf.DType]) -> List[tf.Tensor]:
+  """Cast signals to dtype, only if a dtype is given and they differ."""
+  if dtype is None:
+    return list(signals)
+  return [x if x.dtype == dtype else tf.cast(x, dtype) for x in signals]
+
+
 @gin.register
-class Add(Processor):
+class Add(_PureProcessor):
   """Sum two signals."""
 
-  def __init__(self, name: Text = 'add'):
+  supports_ragged = True
+  supports_direct = True
+
+  def __init__(self, name: Text = 'add', dtype: Optional[tf.DType] = None):
+    """Constructor.
+
+    Args:
+      name: Name of processor.
+      dtype: Optional dtype to sum the signals in, such as tf.bfloat16 to halve
+        memory traffic. If None, signals are summed in their own dtype.
+    """
     super(Add, self).__init__(name=name)
+    self.signal_dtype = dtype
 
   def get_controls(self, signal_one: tf.Tensor,
                    signal_two: tf.Tensor) -> TensorDict:
@@ -177,15 +705,62 @@ class Add(Processor):
 
   def get_signal(self, signal_one: tf.Tensor,
                  signal_two: tf.Tensor) -> tf.Tensor:
+    signal_one, signal_two = _cast_signals([signal_one, signal_two],
+                                           self.signal_dtype)
     return signal_one + signal_two
 
+  def get_signal_from_args(self, signal_one: tf.Tensor,
+                           signal_two: tf.Tensor) -> tf.Tensor:
+    return self.get_signal(signal_one, signal_two)
+
 
 @gin.register
-class Mix(Processor):
+class AddN(_PureProcessor):
+  """Sum any number of signals in a single op."""
+
+  supports_ragged = True
+  supports_direct = True
+
+  def __init__(self, name: Text = 'add_n', dtype: Optional[tf.DType] = None):
+    """Constructor.
+
+    Args:
+      name: Name of processor.
+      dtype: Optional dtype to sum the signals in, such as tf.bfloat16 to halve
+        memory traffic. If None, signals are summed in their own dtype.
+    """
+    super(AddN, self).__init__(name=name)
+    self.signal_dtype = dtype
+
+  def get_controls(self, *signals: tf.Tensor) -> TensorDict:
+    """Just pass signals through."""
+    return {'signal_{}'.format(i): signal for i, signal in enumerate(signals)}
+
+  def get_signal(self, **signals: tf.Tensor) -> tf.Tensor:
+    """Sum signals of the same shape, reading each input only once."""
+    return tf.add_n(_cast_signals(signals.values(), self.signal_dtype))
+
+  def get_signal_from_args(self, *signals: tf.Tensor) -> tf.Tensor:
+    return tf.add_n(_cast_signals(signals, self.signal_dtype))
+
+
+@gin.register
+class Mix(_PureProcessor):
   """Constant-power crossfade between two signals."""
 
-  def __init__(self, name: Text = 'mix'):
+  supports_ragged = True
+  supports_direct = True
+
+  def __init__(self, name: Text = 'mix', dtype: Optional[tf.DType] = None):
+    """Constructor.
+
+    Args:
+      name: Name of processor.
+      dtype: Optional dtype to mix the signals in, such as tf.bfloat16 to halve
+        memory traffic. If None, signals are mixed in their own dtype.
+    """
     super(Mix, self).__init__(name=name)
+    self.signal_dtype = dtype
 
   def get_controls(self, signal_one: tf.Tensor,
                    signal_two: tf.Tensor,
@@ -204,24 +779,50 @@ class Mix(Processor):
     Raises:
       ValueError: If signal_one and signal_two are not the same length.
     """
-    n_time_one = int(signal_one.shape[1])
-    n_time_two = int(signal_two.shape[1])
-    if n_time_one != n_time_two:
-      raise ValueError('The two signals must have the same length instead of'
-                       '{} and {}'.format(n_time_one, n_time_two))
-
-    mix_level = tf.nn.sigmoid(nn_out_mix_level)
-    mix_level = core.resample(mix_level, n_time_one)
     return {
         'signal_one': signal_one,
         'signal_two': signal_two,
-        'mix_level': mix_level
+        'mix_level': self._get_mix_level(signal_one, signal_two,
+                                         nn_out_mix_level)
     }
 
+  def get_signal_from_args(self, signal_one: tf.Tensor,
+                           signal_two: tf.Tensor,
+                           nn_out_mix_level: tf.Tensor) -> tf.Tensor:
+    mix_level = self._get_mix_level(signal_one, signal_two, nn_out_mix_level)
+    return self.get_signal(signal_one, signal_two, mix_level)
+
+  def _get_mix_level(self, signal_one: tf.Tensor, signal_two: tf.Tensor,
+                     nn_out_mix_level: tf.Tensor) -> tf.Tensor:
+    """Scale mix_level to [0, 1] and resample to the signal length."""
+    # Only check static lengths, once when traced, instead of on every step.
+    n_time, n_time_two = signal_one.shape[1], signal_two.shape[1]
+    if n_time is not None and n_time_two is not None and n_time != n_time_two:
+      raise ValueError('The two signals must have the same length instead of '
+                       '{} and {}'.format(n_time, n_time_two))
+    if n_time is None:
+      n_time = tf.shape(signal_one)[1]
+
+    mix_level = tf.nn.sigmoid(nn_out_mix_level)
+
+    # Only resample if mix_level is not already at the signal time steps.
+    n_time_mix = mix_level.shape[1]
+    if isinstance(n_time, int) and n_time_mix is not None:
+      if n_time_mix != n_time:
+        mix_level = core.resample(mix_level, n_time)
+    else:
+      mix_level = tf.cond(tf.equal(tf.shape(mix_level)[1], n_time),
+                          lambda: mix_level,
+                          lambda: core.resample(mix_level, n_time))
+    return mix_level
+
+  @tf.function(jit_compile=True)
   def get_signal(self, signal_one: tf.Tensor, signal_two: tf.Tensor,
                  mix_level: tf.Tensor) -> tf.Tensor:
     """Constant-power cross fade between two signals.
 
+    Compiled with XLA to fuse the elementwise ops into a single kernel.
+
     Args:
       signal_one: 2-D or 3-D tensor.
       signal_two: 2-D or 3-D tensor.
@@ -232,6 +833,12 @@ class Mix(Processor):
     Returns:
       Tensor of mixed output signal.
     """
-    mix_level_one = tf.sqrt(tf.abs(mix_level))
-    mix_level_two = 1.0 - tf.sqrt(tf.abs(mix_level - 1.0))
+    signal_one, signal_two, mix_level = _cast_signals(
+        [signal_one, signal_two, mix_level], self.signal_dtype)
+
+    # mix_level is in [0, 1], so no need for tf.abs() before tf.sqrt().
+    mix_level_one = tf.sqrt(mix_level)
+    mix_level_two = 1.0 - tf.sqrt(1.0 - mix_level)
+    # Keep the crossfade as a single a * x + b * y expression, which XLA fuses
+    # into one kernel and can lower to fused multiply-adds.
     return mix_level_one * signal_one + mix_level_two * signal_two
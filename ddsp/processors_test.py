@@ -24,6 +24,19 @@ import numpy as np
 import tensorflow.compat.v2 as tf
 
 
+class CountingAdd(processors.Add):
+  """Add that counts how many times its signal is traced."""
+
+  def __init__(self, name='add'):
+    super().__init__(name=name)
+    self.n_traces = 0
+
+  def get_signal(self, signal_one, signal_two):
+    if not tf.executing_eagerly():
+      self.n_traces += 1
+    return super().get_signal(signal_one, signal_two)
+
+
 class ProcessorGroupTest(parameterized.TestCase, tf.test.TestCase):
 
   def setUp(self):
@@ -87,6 +100,296 @@ class ProcessorGroupTest(parameterized.TestCase, tf.test.TestCase):
     self.assertIsInstance(outputs, dict)
     self._check_tensor_outputs(self.expected_outputs, outputs)
 
+  @parameterized.named_parameters(
+      ('call_default', False, None, False),
+      ('call_return_all', False, True, True),
+      ('emit_intermediates', True, None, True),
+      ('emit_intermediates_signal_only', True, False, False),
+  )
+  def test_call_returns_intermediates(self, emit_intermediates, return_all,
+                                      expect_dict):
+    """Tests that call() only returns all outputs when requested."""
+    processor_group = processors.ProcessorGroup(
+        dag=self.dag,
+        name='processor_group',
+        emit_intermediates=emit_intermediates)
+    outputs = processor_group(self.nn_outputs, return_all=return_all)
+    if expect_dict:
+      self._check_tensor_outputs(self.expected_outputs, outputs)
+    else:
+      self.assertListEqual([self.n_batch, self.n_time],
+                           outputs.shape.as_list())
+
+  def test_jit_compile(self):
+    """Tests that the DAG gives the same output when compiled with XLA."""
+    signal = lambda: np.random.randn(self.n_batch, 100, 2).astype(np.float32)
+    inputs = {'one': signal(), 'two': signal(), 'mix_level': signal()[..., :1]}
+    dag = [(processors.Mix(name='mix'), ['one', 'two', 'mix_level']),
+           (processors.Add(name='add'), ['mix/signal', 'one'])]
+    outputs = [
+        processors.ProcessorGroup(dag=dag, jit_compile=jit_compile)(inputs)
+        for jit_compile in (False, True)
+    ]
+    self.assertAllClose(outputs[0], outputs[1])
+
+  def test_device_placement(self):
+    """Tests that the DAG outputs are placed on the requested device."""
+    processor_group = processors.ProcessorGroup(dag=self.dag,
+                                                name='processor_group',
+                                                device='/CPU:0')
+    output = processor_group(self.nn_outputs)
+    self.assertEndsWith(output.device, 'CPU:0')
+
+  def test_outer_device_scope_is_kept(self):
+    """Tests that the caller's device scope is used if no device is given."""
+    processor_group = processors.ProcessorGroup(
+        dag=[(processors.Add(name='add'), ['one', 'two'])])
+    x = tf.ones([2, 3])
+
+    @tf.function
+    def call_on_cpu(inputs):
+      with tf.device('/device:CPU:0'):
+        return processor_group(inputs)
+
+    graph = call_on_cpu.get_concrete_function({'one': x, 'two': x}).graph
+    call_ops = [op for op in graph.get_operations()
+                if op.type in ('PartitionedCall', 'StatefulPartitionedCall')]
+    self.assertNotEmpty(call_ops)
+    for op in call_ops:
+      self.assertEqual('/device:CPU:0', op.device)
+
+  def test_nested_keys_match_manual_chain(self):
+    """Tests that nodes reading nested keys get the right tensors."""
+    signal = lambda: np.random.randn(self.n_batch, 100, 2).astype(np.float32)
+    inputs = {'one': signal(), 'two': signal(), 'mix_level': signal()[..., :1]}
+    mix = processors.Mix(name='mix')
+    add = processors.Add(name='add')
+    processor_group = processors.ProcessorGroup(dag=[
+        (mix, ['one', 'two', 'mix_level']),
+        (add, ['mix/signal', 'mix/controls/mix_level']),
+    ])
+
+    controls = mix.get_controls(inputs['one'], inputs['two'],
+                                inputs['mix_level'])
+    expected = add(mix.get_signal(**controls), controls['mix_level'])
+    for _ in range(2):
+      outputs = processor_group.get_controls(inputs)
+      self.assertAllClose(controls['mix_level'],
+                          outputs['mix']['controls']['mix_level'])
+      self.assertAllClose(expected, processor_group.get_signal(outputs))
+
+  def test_nested_inputs_with_shared_prefixes(self):
+    """Tests that nested input keys sharing a prefix are all looked up."""
+    signal = lambda: np.random.randn(self.n_batch, 100, 2).astype(np.float32)
+    inputs = {'synth': {'controls': {'one': signal(), 'two': signal()},
+                        'signal': signal()}}
+    processor_group = processors.ProcessorGroup(dag=[
+        (processors.AddN(name='add_n'),
+         ['synth/controls/one', 'synth/controls/two', 'synth/signal']),
+    ])
+
+    expected = (core.nested_lookup('synth/controls/one', inputs) +
+                core.nested_lookup('synth/controls/two', inputs) +
+                core.nested_lookup('synth/signal', inputs))
+    for _ in range(2):
+      self.assertAllClose(expected, processor_group(inputs))
+
+  def test_number_of_traces_is_bounded(self):
+    """Tests that inputs with new shapes run untraced after max_traces."""
+    add = CountingAdd(name='add')
+    processor_group = processors.ProcessorGroup(dag=[(add, ['one', 'two'])],
+                                                max_traces=2)
+
+    def call(n_batch):
+      x = tf.ones([n_batch, 3])
+      self.assertAllEqual(x + x, processor_group({'one': x, 'two': x}))
+
+    for n_batch in (1, 2):
+      call(n_batch)
+    n_traces = add.n_traces
+    for n_batch in range(3, 8):
+      call(n_batch)
+
+    self.assertEqual(add.n_traces, n_traces)
+
+  @parameterized.named_parameters(('eager', False), ('tf_function', True))
+  def test_processors_are_built_in_name_scope(self, use_tf_function):
+    """Tests that processors are built on the first run of the DAG."""
+    processor_group = processors.ProcessorGroup(dag=self.dag,
+                                                name='processor_group')
+    self.assertFalse(any(p.built for p in processor_group.processors))
+
+    call = tf.function(processor_group) if use_tf_function else processor_group
+    _ = call(self.nn_outputs)
+
+    self.assertTrue(all(p.built for p in processor_group.processors))
+    self.assertListEqual(['processor_group/ir:0'],
+                         [v.name for v in processor_group.trainable_variables])
+
+  def test_routing_nodes_skip_controls(self):
+    """Tests a DAG mixing routing nodes with and without read controls."""
+    signal = lambda: np.random.randn(self.n_batch, 100, 2).astype(np.float32)
+    inputs = {'one': signal(), 'two': signal(), 'mix_level': signal()[..., :1]}
+    # Controls of mix_a are read by add, so only add and mix_b skip controls.
+    mix_a = processors.Mix(name='mix_a')
+    add = processors.Add(name='add')
+    mix_b = processors.Mix(name='mix_b')
+    processor_group = processors.ProcessorGroup(dag=[
+        (mix_a, ['one', 'two', 'mix_level']),
+        (add, ['mix_a/signal', 'mix_a/controls/signal_one']),
+        (mix_b, ['add/signal', 'two', 'mix_level']),
+    ])
+
+    signal_a = mix_a(inputs['one'], inputs['two'], inputs['mix_level'])
+    signal_add = add(signal_a, inputs['one'])
+    expected = mix_b(signal_add, inputs['two'], inputs['mix_level'])
+    for return_all in (False, True, False):
+      outputs = processor_group(inputs, return_all=return_all)
+      if return_all:
+        self.assertAllClose(signal_add, outputs['add']['signal'])
+        outputs = processor_group.get_signal(outputs)
+      self.assertAllClose(expected, outputs)
+
+  def test_outputs_match_sequential_order(self):
+    """Tests a DAG where independent nodes are not adjacent in the list."""
+    signal = lambda: np.random.randn(self.n_batch, 100, 2).astype(np.float32)
+    inputs = {'one': signal(), 'two': signal(), 'three': signal(),
+              'mix_level': signal()[..., :1]}
+    # add_c only reads inputs, so it runs alongside add_a, before add_b.
+    add_a = processors.Add(name='add_a')
+    add_b = processors.Add(name='add_b')
+    add_c = processors.Add(name='add_c')
+    mix = processors.Mix(name='mix')
+    processor_group = processors.ProcessorGroup(dag=[
+        (add_a, ['one', 'two']),
+        (add_b, ['add_a/signal', 'three']),
+        (add_c, ['one', 'three']),
+        (mix, ['add_b/signal', 'add_c/signal', 'mix_level']),
+    ])
+
+    signal_a = add_a(inputs['one'], inputs['two'])
+    signal_b = add_b(signal_a, inputs['three'])
+    signal_c = add_c(inputs['one'], inputs['three'])
+    signal_mix = mix(signal_b, signal_c, inputs['mix_level'])
+    outputs = processor_group.get_controls(inputs)
+    for name, expected in [('add_a', signal_a), ('add_b', signal_b),
+                           ('add_c', signal_c), ('mix', signal_mix)]:
+      self.assertAllClose(expected, outputs[name]['signal'])
+    self.assertAllClose(signal_mix, processor_group(inputs))
+
+  @parameterized.named_parameters(
+      ('static', [4, 3]),
+      ('any_batch', [None, 3]),
+  )
+  def test_shape_profiles_are_traced_in_build(self, profile_shape):
+    """Tests that calls matching a shape profile are not traced again."""
+    add = CountingAdd(name='add')
+    shape_profile = {'one': tf.TensorSpec(profile_shape, tf.float32),
+                     'two': tf.TensorSpec(profile_shape, tf.float32)}
+    processor_group = processors.ProcessorGroup(dag=[(add, ['one', 'two'])],
+                                                shape_profiles=[shape_profile])
+    processor_group.build()
+    n_traces = add.n_traces
+
+    x = tf.ones([4, 3])
+    output = processor_group({'one': x, 'two': x})
+
+    self.assertEqual(add.n_traces, n_traces)
+    self.assertAllEqual(x + x, output)
+
+  def test_ragged_shape_profiles_need_ragged_group(self):
+    spec = tf.RaggedTensorSpec([None, None, 2], tf.float32, ragged_rank=1)
+    processor_group = processors.ProcessorGroup(
+        dag=[(processors.Add(name='add'), ['one', 'two'])],
+        shape_profiles=[{'one': spec, 'two': spec}])
+    with self.assertRaises(ValueError):
+      processor_group.build()
+
+  @parameterized.named_parameters(('signal', False), ('return_all', True))
+  def test_dag_is_traced_once(self, return_all):
+    """Tests that repeated calls reuse the same traced DAG."""
+    add = CountingAdd(name='add')
+    processor_group = processors.ProcessorGroup(dag=[(add, ['one', 'two'])])
+    x = tf.ones([4, 3])
+
+    _ = processor_group({'one': x, 'two': x}, return_all=return_all)
+    n_traces = add.n_traces
+    outputs = processor_group({'one': x, 'two': x}, return_all=return_all)
+
+    self.assertEqual(add.n_traces, n_traces)
+    if return_all:
+      outputs = processor_group.get_signal(outputs)
+    self.assertAllEqual(x + x, outputs)
+
+
+class RaggedProcessorGroupTest(tf.test.TestCase):
+
+  def setUp(self):
+    """Create variable length signals."""
+    super().setUp()
+    self.row_lengths = [30, 50, 20]
+    ragged_signal = lambda: tf.RaggedTensor.from_row_lengths(
+        tf.random.normal([sum(self.row_lengths), 2]), self.row_lengths)
+    self.inputs = {'one': ragged_signal(), 'two': ragged_signal()}
+
+  def test_routing_processors_keep_ragged_signals(self):
+    dag = [(processors.Add(name='add'), ['one', 'two']),
+           (processors.AddN(name='add_n'), ['add/signal', 'one', 'two'])]
+    processor_group = processors.RaggedProcessorGroup(dag=dag)
+
+    output = processor_group(self.inputs)
+
+    self.assertIsInstance(output, tf.RaggedTensor)
+    self.assertAllEqual(self.row_lengths, output.row_lengths())
+    expected = 2.0 * (self.inputs['one'] + self.inputs['two'])
+    self.assertAllClose(expected.flat_values, output.flat_values)
+
+  def test_shape_profiles_are_traced_in_build(self):
+    add = CountingAdd(name='add')
+    spec = tf.RaggedTensorSpec([None, None, 2], tf.float32, ragged_rank=1)
+    processor_group = processors.RaggedProcessorGroup(
+        dag=[(add, ['one', 'two'])],
+        shape_profiles=[{'one': spec, 'two': spec}])
+    processor_group.build()
+    n_traces = add.n_traces
+
+    output = processor_group(self.inputs)
+
+    self.assertEqual(add.n_traces, n_traces)
+    expected = self.inputs['one'] + self.inputs['two']
+    self.assertAllClose(expected.flat_values, output.flat_values)
+
+  def test_mix_level_at_control_rate(self):
+    mix_level = tf.RaggedTensor.from_row_lengths(
+        tf.random.normal([sum(self.row_lengths) // 10, 1]),
+        [n // 10 for n in self.row_lengths])
+    inputs = dict(self.inputs, mix_level=mix_level)
+    mix = processors.Mix(name='mix')
+    processor_group = processors.RaggedProcessorGroup(
+        dag=[(mix, ['one', 'two', 'mix_level'])])
+
+    for return_all in (False, True):
+      output = processor_group(inputs, return_all=return_all)
+      if return_all:
+        output = processor_group.get_signal(output)
+
+      self.assertIsInstance(output, tf.RaggedTensor)
+      self.assertAllEqual(self.row_lengths, output.row_lengths())
+      expected = mix(self.inputs['one'].to_tensor(),
+                     self.inputs['two'].to_tensor(), mix_level.to_tensor())
+      expected = tf.RaggedTensor.from_tensor(expected,
+                                             lengths=self.row_lengths)
+      self.assertAllClose(expected.flat_values, output.flat_values)
+
+  def test_dense_inputs_are_padded(self):
+    dense = tf.ones([3, max(self.row_lengths), 2])
+    dag = [(processors.Add(name='add'), ['one', 'dense'])]
+    processor_group = processors.RaggedProcessorGroup(dag=dag)
+
+    output = processor_group({'one': self.inputs['one'], 'dense': dense})
+
+    self.assertAllClose(self.inputs['one'].to_tensor() + dense, output)
+
 
 class AddTest(tf.test.TestCase):
 
@@ -100,6 +403,104 @@ class AddTest(tf.test.TestCase):
     expected = np.zeros((2, 3), dtype=np.float32) + 3.0
     self.assertAllEqual(expected, output)
 
+  def test_signals_are_broadcast(self):
+    processor = processors.Add(name='add')
+    x = tf.ones((2, 100, 3))
+    y = tf.ones((2, 100, 1))
+
+    output = processor(x, y)
+
+    self.assertAllEqual(np.zeros((2, 100, 3)) + 2.0, output)
+
+  def test_concrete_functions_are_cached(self):
+    """Tests that groups sharing a processor reuse its traced functions."""
+    processor = CountingAdd(name='add')
+    inputs = {'one': tf.ones((2, 3)), 'two': tf.ones((2, 3)) + 1.0}
+    _ = processors.ProcessorGroup(
+        dag=[(processor, ['one', 'two'])]).get_controls(inputs)
+    n_traces = processor.n_traces
+
+    processor_group = processors.ProcessorGroup(
+        dag=[(processor, ['one', 'two'])], name='other_group')
+    output = processor_group.get_signal(processor_group.get_controls(inputs))
+
+    self.assertEqual(processor.n_traces, n_traces)
+    expected = np.zeros((2, 3), dtype=np.float32) + 3.0
+    self.assertAllEqual(expected, output)
+
+  def test_untraced_dag_does_not_trace_processor(self):
+    """Tests that processors are run eagerly when the DAG is not traced."""
+    processor = CountingAdd(name='add')
+    processor_group = processors.ProcessorGroup(
+        dag=[(processor, ['one', 'two'])], max_traces=1)
+
+    def get_signal(n_batch):
+      x = tf.ones([n_batch, 3])
+      outputs = processor_group.get_controls({'one': x, 'two': x})
+      self.assertAllEqual(x + x, processor_group.get_signal(outputs))
+
+    get_signal(1)
+    n_traces = processor.n_traces
+    for n_batch in range(2, 8):
+      get_signal(n_batch)
+
+    self.assertEqual(processor.n_traces, n_traces)
+
+  def test_group_keeps_input_dtype(self):
+    processor_group = processors.ProcessorGroup(
+        dag=[(processors.Add(name='add'), ['one', 'two'])])
+    x = tf.ones((2, 3), dtype=tf.float16)
+
+    outputs = processor_group.get_controls({'one': x, 'two': x})
+    output = processor_group.get_signal(outputs)
+
+    self.assertEqual(output.dtype, tf.float16)
+    self.assertAllEqual(np.zeros((2, 3)) + 2.0, output)
+
+  def test_call_skips_keras_layer(self):
+    processor = processors.Add(name='add')
+    x = np.zeros((2, 3), dtype=np.float32) + 1.0
+    y = np.zeros((2, 3), dtype=np.float32) + 2.0
+
+    output = processor(x, y)
+
+    # Not built, since keras.Layer.__call__() was never run.
+    self.assertFalse(processor.built)
+    self.assertIsInstance(output, tf.Tensor)
+    self.assertAllEqual(np.zeros((2, 3)) + 3.0, output)
+
+  def test_call_ignores_keras_arguments(self):
+    processor = processors.Add(name='add')
+    x = tf.ones((2, 3))
+
+    output = processor(x, x, training=True, mask=None)
+
+    self.assertAllEqual(np.zeros((2, 3)) + 2.0, output)
+
+  def test_reduced_precision(self):
+    processor = processors.Add(name='add', dtype=tf.bfloat16)
+    x = tf.zeros((2, 3), dtype=tf.float32) + 1.0
+    y = tf.zeros((2, 3), dtype=tf.bfloat16) + 2.0
+
+    output = processor(x, y)
+
+    self.assertEqual(output.dtype, tf.bfloat16)
+    self.assertAllEqual(np.zeros((2, 3)) + 3.0, tf.cast(output, tf.float32))
+
+
+class AddNTest(tf.test.TestCase):
+
+  def test_output_is_correct(self):
+    processor = processors.AddN(name='add_n')
+    x = tf.zeros((2, 3), dtype=tf.float32) + 1.0
+    y = tf.zeros((2, 3), dtype=tf.float32) + 2.0
+    z = tf.zeros((2, 3), dtype=tf.float32) + 3.0
+
+    output = processor(x, y, z)
+
+    expected = np.zeros((2, 3), dtype=np.float32) + 6.0
+    self.assertAllEqual(expected, output)
+
 
 class MixTest(tf.test.TestCase):
 
@@ -114,6 +515,76 @@ class MixTest(tf.test.TestCase):
 
     self.assertListEqual([2, 100, 3], output.shape.as_list())
 
+  def test_mismatched_lengths_raise_error(self):
+    processor = processors.Mix(name='mix')
+    x1 = np.zeros((2, 100, 3), dtype=np.float32)
+    x2 = np.zeros((2, 50, 3), dtype=np.float32)
+    mix_level = np.zeros((2, 10, 1), dtype=np.float32)
+
+    with self.assertRaises(ValueError):
+      processor(x1, x2, mix_level)
+
+  def test_group_checks_lengths(self):
+    processor_group = processors.ProcessorGroup(
+        dag=[(processors.Mix(name='mix'), ['one', 'two', 'mix_level'])])
+    inputs = {'one': np.zeros((2, 100, 3), dtype=np.float32),
+              'two': np.zeros((2, 50, 3), dtype=np.float32),
+              'mix_level': np.zeros((2, 10, 1), dtype=np.float32)}
+
+    with self.assertRaises(ValueError):
+      processor_group(inputs)
+
+  def test_group_runs_at_different_lengths(self):
+    processor = processors.Mix(name='mix')
+    processor_group = processors.ProcessorGroup(
+        dag=[(processor, ['one', 'two', 'mix_level'])])
+    mix_level = np.random.randn(2, 10, 1).astype(np.float32)
+
+    for n_time in (100, 200):
+      x1 = np.random.randn(2, n_time, 3).astype(np.float32)
+      x2 = np.random.randn(2, n_time, 3).astype(np.float32)
+      output = processor_group({'one': x1, 'two': x2, 'mix_level': mix_level})
+      self.assertAllClose(processor(x1, x2, mix_level), output)
+
+  def test_get_signal_from_args_is_correct(self):
+    processor = processors.Mix(name='mix')
+    x1 = np.zeros((2, 100, 3), dtype=np.float32) + 1.0
+    x2 = np.zeros((2, 100, 3), dtype=np.float32) + 2.0
+    nn_out_mix_level = np.random.randn(2, 10, 1).astype(np.float32)
+
+    output = processor.get_signal_from_args(x1, x2, nn_out_mix_level)
+
+    expected = processor(x1, x2, nn_out_mix_level)
+    self.assertAllClose(expected, output)
+
+  def test_get_signal_is_correct(self):
+    processor = processors.Mix(name='mix')
+    x1 = np.zeros((2, 100, 3), dtype=np.float32) + 1.0
+    x2 = np.zeros((2, 100, 3), dtype=np.float32) + 2.0
+    mix_level = np.zeros((2, 100, 1), dtype=np.float32) + 0.3
+
+    output = processor.get_signal(x1, x2, mix_level)
+
+    expected = (np.sqrt(mix_level) * x1 +
+                (1.0 - np.sqrt(np.abs(mix_level - 1.0))) * x2)
+    self.assertAllClose(expected, output)
+
+  def test_reduced_precision_is_cast_back_by_group(self):
+    mix = processors.Mix(name='mix', dtype=tf.bfloat16)
+    group = processors.ProcessorGroup(dag=[(mix, ['x1', 'x2', 'mix_level'])])
+    x1 = np.zeros((2, 100, 3), dtype=np.float32) + 1.0
+    x2 = np.zeros((2, 100, 3), dtype=np.float32) + 2.0
+    mix_level = np.zeros((2, 100, 1), dtype=np.float32) + 0.3
+    inputs = {'x1': x1, 'x2': x2, 'mix_level': mix_level}
+
+    outputs = group(inputs, return_all=True)
+    output = group(inputs)
+
+    self.assertEqual(outputs['mix']['signal'].dtype, tf.bfloat16)
+    self.assertEqual(output.dtype, tf.float32)
+    expected = mix(x1, x2, mix_level)
+    self.assertAllClose(tf.cast(expected, tf.float32), output)
+
 
 if __name__ == '__main__':
   tf.test.main()